@@ -1,11 +1,25 @@
 import os
+import ssl
+import asyncio
 import logging
-import toml
-from typing import Optional, Dict, Any, List
+try:
+    import tomllib
+except ModuleNotFoundError:  # Python < 3.11
+    import tomli as tomllib
+from typing import Optional, Dict, Any, List, Tuple, Mapping
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
-import gitlab
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote
+import aiohttp
+import ijson
+import orjson
+from cachetools import TTLCache
+import re
+import math
 import fnmatch
+import functools
+import itertools
 import paramiko
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP, Context
@@ -20,22 +34,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Load environment variables, unless the token is already set in the environment
+if not os.getenv("GITLAB_TOKEN"):
+    load_dotenv()
 
-# Load configuration from TOML file
-try:
-    with open("config.toml", "r") as f:
-        config = toml.load(f)
-except FileNotFoundError:
-    config = {}
-except Exception as e:
-    logging.error(f"Error loading config.toml: {e}")
-    config = {}
+@functools.cache
+def _config() -> Dict[str, Any]:
+    """Load configuration from the TOML file on first use."""
+    try:
+        with open("config.toml", "rb") as f:
+            return tomllib.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        logging.error(f"Error loading config.toml: {e}")
+        return {}
+
+# Worker threads for blocking calls that have no asyncio equivalent (SSH)
+_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gitlab-mcp")
+
+# Prefix of the GitLab REST v4 API, relative to the instance root
+API_PREFIX = "/api/v4"
+# GitLab GraphQL endpoint, relative to the instance root
+GRAPHQL_PATH = "/api/graphql"
+# Maximum number of pages of one list fetched concurrently
+PAGE_CONCURRENCY = 8
+
+# Process-wide HTTP session shared by every MCP session, so that pooled
+# keep-alive connections to GitLab survive across tool calls
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_USERS = 0
+# Serializes creating and closing _SESSION across concurrent lifespans
+_SESSION_LOCK = asyncio.Lock()
+# The pre-warm is best effort and must not hold up startup for long
+PREWARM_TIMEOUT = aiohttp.ClientTimeout(total=5)
+
+async def _open_session(host: str, token: str) -> aiohttp.ClientSession:
+    """Create the shared GitLab session and pre-warm a pooled connection."""
+    session = aiohttp.ClientSession(
+        base_url=f"https://{host}",
+        headers={"PRIVATE-TOKEN": token},
+        connector=aiohttp.TCPConnector(
+            limit=32,
+            limit_per_host=16,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            ssl=ssl.create_default_context(),
+        ),
+        timeout=aiohttp.ClientTimeout(total=120),
+        json_serialize=lambda obj: orjson.dumps(obj).decode(),
+    )
+    try:
+        async with session.head(f"{API_PREFIX}/version", timeout=PREWARM_TIMEOUT):
+            pass
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        logger.warning(f"Failed to pre-warm GitLab connection: {e!r}")
+    except BaseException:
+        await session.close()
+        raise
+    return session
 
 @asynccontextmanager
-async def gitlab_lifespan(server: FastMCP) -> AsyncIterator[gitlab.Gitlab]:
+async def gitlab_lifespan(server: FastMCP) -> AsyncIterator[aiohttp.ClientSession]:
     """Manage GitLab connection details"""
+    global _SESSION, _SESSION_USERS
     host = os.getenv("GITLAB_HOST", "gitlab.com")
     token = os.getenv("GITLAB_TOKEN", "")
     
@@ -46,35 +108,484 @@ async def gitlab_lifespan(server: FastMCP) -> AsyncIterator[gitlab.Gitlab]:
             "Please set this in your environment or .env file."
         )
     
-    gl = gitlab.Gitlab(f"https://{host}", private_token=token, timeout=120)
+    async with _SESSION_LOCK:
+        if _SESSION is None or _SESSION.closed:
+            _SESSION = await _open_session(host, token)
+            logger.info("GitLab client initialized")
+        _SESSION_USERS += 1
+        session = _SESSION
     try:
-        logger.info("GitLab client initialized")
-        yield gl
+        yield session
     except Exception as e:
         logger.error(f"An error occurred during GitLab client initialization: {e}")
         raise
     finally:
-        logger.info("GitLab client session closed.")
+        async with _SESSION_LOCK:
+            _SESSION_USERS -= 1
+            if _SESSION_USERS == 0:
+                await _SESSION.close()
+                _SESSION = None
+                logger.info("GitLab client session closed.")
 
 # Create MCP server
 mcp = FastMCP(
     "GitLab MCP for Code Review",
     lifespan=gitlab_lifespan,
-    dependencies=["python-dotenv", "requests", "python-gitlab"]
+    dependencies=["python-dotenv", "aiohttp", "ijson", "orjson", "cachetools"]
 )
 
-def is_path_excluded(file_path: str, patterns: List[str]) -> bool:
-    """Check if a file path matches any of the exclusion patterns."""
-    for pattern in patterns:
+def _project_path(project_id: str) -> str:
+    """Build the REST path of a project, URL-encoding path-style project IDs."""
+    return f"/projects/{quote(unquote(str(project_id)), safe='')}"
+
+def _mr_path(project_id: str, merge_request_iid: str) -> str:
+    """Build the REST path of a merge request."""
+    return f"{_project_path(project_id)}/merge_requests/{merge_request_iid}"
+
+# Last ETag and decoded response per GET request, for conditional requests.
+# The cache is bounded by the total size of the raw response bodies it holds.
+ETAG_CACHE_BYTES = 32 * 1024 * 1024
+_etag_cache: TTLCache = TTLCache(maxsize=ETAG_CACHE_BYTES, ttl=300, getsizeof=lambda entry: entry[3])
+
+async def _request(
+    session: aiohttp.ClientSession, method: str, path: str, *, etag: bool = True, **kwargs: Any
+) -> Tuple[Any, Mapping[str, str]]:
+    """
+    Issue a GitLab REST API call and decode its JSON body.
+
+    GET requests are conditional: the ETag of the previous identical request is
+    sent as If-None-Match, and on 304 Not Modified its cached result is reused.
+
+    Args:
+        session: The shared GitLab HTTP session
+        method: The HTTP method
+        path: The API path relative to /api/v4, e.g. "/projects/1"
+        etag: Whether a GET goes through the ETag cache
+        **kwargs: Extra arguments passed to aiohttp (params, json, ...)
+    Returns:
+        A (decoded body, response headers) tuple; the body is None when empty
+    """
+    cache_key = None
+    cached = None
+    if method == "GET" and etag:
+        cache_key = (path, tuple(sorted((kwargs.get("params") or {}).items())))
+        cached = _etag_cache.get(cache_key)
+        if cached is not None:
+            kwargs["headers"] = {**kwargs.get("headers", {}), "If-None-Match": cached[0]}
+
+    async with session.request(method, f"{API_PREFIX}{path}", **kwargs) as resp:
+        if resp.status == 304 and cached is not None:
+            return cached[1], cached[2]
+        body = await resp.read()
+        if resp.status >= 400:
+            logger.error(
+                f"GitLab API error {resp.status} on {method} {path}: "
+                f"{body.decode('utf-8', 'replace')}"
+            )
+            resp.raise_for_status()
+        data = orjson.loads(body) if body else None
+        etag = resp.headers.get("ETag")
+        if cache_key is not None and etag and len(body) <= ETAG_CACHE_BYTES:
+            _etag_cache[cache_key] = (etag, data, resp.headers, len(body))
+        return data, resp.headers
+
+async def _get(
+    session: aiohttp.ClientSession,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    etag: bool = True,
+) -> Any:
+    """GET a GitLab API path and return the decoded body."""
+    data, _ = await _request(session, "GET", path, etag=etag, params=params)
+    return data
+
+async def _get_all(
+    session: aiohttp.ClientSession,
+    path: str,
+    params: Optional[Dict[str, Any]] = None,
+    max_items: Optional[int] = None,
+) -> List[Any]:
+    """
+    GET every page of a paginated GitLab list endpoint and concatenate them.
+
+    The first page tells how many pages there are (X-Total-Pages); the rest are
+    then fetched concurrently, at most PAGE_CONCURRENCY at a time. GitLab omits
+    that header for very large collections, in which case pages are followed
+    one by one through X-Next-Page.
+
+    Args:
+        session: The shared GitLab HTTP session
+        path: The API path relative to /api/v4
+        params: Query parameters; per_page defaults to 100
+        max_items: Stop once this many items have been collected
+    Returns:
+        The items of all pages, in page order
+    """
+    if max_items is not None and max_items <= 0:
+        return []
+    params = {"per_page": 100, **(params or {}), "page": 1}
+    data, headers = await _request(session, "GET", path, params=params)
+    items: List[Any] = list(data or [])
+
+    total_pages = int(headers.get("X-Total-Pages") or 0)
+    per_page = int(params["per_page"])
+    if max_items is not None and per_page > 0:
+        total_pages = min(total_pages, math.ceil(max_items / per_page))
+
+    if total_pages > 1:
+        semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+
+        async def fetch_page(page: int) -> List[Any]:
+            async with semaphore:
+                page_data, _ = await _request(
+                    session, "GET", path, params={**params, "page": page}
+                )
+                return page_data or []
+
+        pages = await asyncio.gather(*(fetch_page(p) for p in range(2, total_pages + 1)))
+        items.extend(itertools.chain.from_iterable(pages))
+    elif not headers.get("X-Total-Pages"):
+        page = headers.get("X-Next-Page", "")
+        while page and (max_items is None or len(items) < max_items):
+            data, headers = await _request(session, "GET", path, params={**params, "page": page})
+            items.extend(data or [])
+            page = headers.get("X-Next-Page", "")
+
+    return items if max_items is None else items[:max_items]
+
+async def _post(
+    session: aiohttp.ClientSession, path: str, json: Optional[Dict[str, Any]] = None
+) -> Any:
+    """POST a JSON payload to a GitLab API path and return the decoded body."""
+    data, _ = await _request(session, "POST", path, json=json)
+    return data
+
+async def _put(
+    session: aiohttp.ClientSession, path: str, json: Optional[Dict[str, Any]] = None
+) -> Any:
+    """PUT a JSON payload to a GitLab API path and return the decoded body."""
+    data, _ = await _request(session, "PUT", path, json=json)
+    return data
+
+async def _delete(session: aiohttp.ClientSession, path: str) -> Any:
+    """DELETE a GitLab API path and return the decoded body, if any."""
+    data, _ = await _request(session, "DELETE", path)
+    return data
+
+# Comparisons between two full commit SHAs never change, so they are kept longer.
+# Like _etag_cache, the cache is bounded by the serialized size of its entries.
+COMPARE_CACHE_BYTES = 32 * 1024 * 1024
+_compare_cache: TTLCache = TTLCache(maxsize=COMPARE_CACHE_BYTES, ttl=3600, getsizeof=lambda entry: entry[1])
+_SHA_RE = re.compile(r"[0-9a-f]{40}|[0-9a-f]{64}")
+
+async def _graphql(
+    session: aiohttp.ClientSession, query: str, variables: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Run a GitLab GraphQL query.
+
+    Args:
+        session: The shared GitLab HTTP session
+        query: The GraphQL query document
+        variables: The query variables
+    Returns:
+        The "data" member of the response
+    Raises:
+        ValueError: If GitLab reports GraphQL errors
+    """
+    payload = {"query": query, "variables": variables}
+    async with session.post(GRAPHQL_PATH, json=payload) as resp:
+        body = await resp.read()
+        if resp.status >= 400:
+            logger.error(
+                f"GitLab GraphQL error {resp.status}: {body.decode('utf-8', 'replace')}"
+            )
+            resp.raise_for_status()
+    result = orjson.loads(body)
+    if result.get("errors"):
+        raise ValueError(f"GitLab GraphQL errors: {result['errors']}")
+    return result.get("data") or {}
+
+# Fields of a merge request fetched through GraphQL: exactly what
+# fetch_merge_request keeps, apart from the diffs which GraphQL does not expose
+_MR_GRAPHQL_FIELDS = """
+    id iid projectId title description state sourceBranch targetBranch
+    author { name }
+    diffRefs { baseSha headSha startSha }
+    commits(first: 100) {
+        pageInfo { hasNextPage }
+        nodes { sha shortId title authorName }
+    }
+    discussions(first: 100) {
+        pageInfo { hasNextPage }
+        nodes {
+            id
+            notes(first: 100) {
+                pageInfo { hasNextPage }
+                nodes {
+                    id body system
+                    author { name }
+                    position {
+                        positionType oldPath newPath oldLine newLine
+                        width height x y
+                        diffRefs { baseSha startSha headSha }
+                    }
+                }
+            }
+        }
+    }
+"""
+
+_MR_BY_PATH_QUERY = """
+query($path: ID!, $iid: String!) {
+    project(fullPath: $path) { mergeRequest(iid: $iid) { %s } }
+}
+""" % _MR_GRAPHQL_FIELDS
+
+_MR_BY_ID_QUERY = """
+query($ids: [ID!], $iid: String!) {
+    projects(ids: $ids) { nodes { mergeRequest(iid: $iid) { %s } } }
+}
+""" % _MR_GRAPHQL_FIELDS
+
+def _gid_parts(gid: str) -> Tuple[str, Any]:
+    """Split a GraphQL global ID like gid://gitlab/DiffNote/12 into ("DiffNote", 12)."""
+    _, _, rest = gid.rpartition("gitlab/")
+    kind, _, raw_id = rest.partition("/")
+    return kind, int(raw_id) if raw_id.isdigit() else raw_id
+
+def _graphql_note_to_rest(note: Dict[str, Any]) -> Dict[str, Any]:
+    """Reshape a GraphQL note into the REST note fields used by fetch_merge_request."""
+    kind, note_id = _gid_parts(note["id"])
+    rest_note = {
+        "id": note_id,
+        # REST 中普通评论的 type 为 null
+        "type": None if kind == "Note" else kind,
+        "body": note.get("body"),
+        "system": note.get("system"),
+        "author": note.get("author") or {},
+    }
+    position = note.get("position")
+    if position:
+        diff_refs = position.get("diffRefs") or {}
+        rest_note["position"] = {
+            "base_sha": diff_refs.get("baseSha"),
+            "start_sha": diff_refs.get("startSha"),
+            "head_sha": diff_refs.get("headSha"),
+            "old_path": position.get("oldPath"),
+            "new_path": position.get("newPath"),
+            "position_type": position.get("positionType"),
+            "old_line": position.get("oldLine"),
+            "new_line": position.get("newLine"),
+        }
+        if position.get("positionType") == "image":
+            rest_note["position"].update({
+                "width": position.get("width"),
+                "height": position.get("height"),
+                "x": position.get("x"),
+                "y": position.get("y"),
+            })
+    return rest_note
+
+def _has_text_position(discussion: Dict[str, Any]) -> bool:
+    """
+    Whether a GraphQL discussion holds a note on a diff line.
+
+    GraphQL does not expose the line_range of such notes, so discussions that
+    contain one are read from the REST API instead.
+    """
+    return any(
+        (n.get("position") or {}).get("positionType") == "text"
+        for n in discussion["notes"]["nodes"]
+    )
+
+async def _fetch_mr_graphql(
+    session: aiohttp.ClientSession, project_id: str, merge_request_iid: str
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Fetch a merge request with its commits and discussions in one GraphQL query.
+
+    The result is reshaped into the REST representation so callers can treat
+    both paths alike. Collections with more than one page, and discussions with
+    diff line notes, are completed through the REST API, and any GraphQL failure
+    falls back to REST entirely.
+
+    Args:
+        session: The shared GitLab HTTP session
+        project_id: The GitLab project ID or URL-encoded path
+        merge_request_iid: The merge request IID (project-specific ID)
+    Returns:
+        A (merge request, commits, discussions) tuple in REST shape
+    """
+    mr_path = _mr_path(project_id, merge_request_iid)
+    project_id = unquote(str(project_id))
+    # None marks a collection that did not fit in one GraphQL page
+    commits: Optional[List[Dict[str, Any]]] = None
+    discussions: Optional[List[Dict[str, Any]]] = None
+    try:
+        if project_id.isdigit():
+            data = await _graphql(session, _MR_BY_ID_QUERY, {
+                "ids": [f"gid://gitlab/Project/{project_id}"],
+                "iid": str(merge_request_iid),
+            })
+            nodes = (data.get("projects") or {}).get("nodes") or [{}]
+            mr = nodes[0].get("mergeRequest")
+        else:
+            data = await _graphql(session, _MR_BY_PATH_QUERY, {
+                "path": project_id,
+                "iid": str(merge_request_iid),
+            })
+            mr = (data.get("project") or {}).get("mergeRequest")
+        if mr is None:
+            raise ValueError(f"Merge request {project_id}!{merge_request_iid} not found via GraphQL")
+
+        mr_data = {
+            "id": _gid_parts(mr["id"])[1],
+            "iid": int(mr["iid"]),
+            "project_id": mr.get("projectId"),
+            "title": mr.get("title"),
+            "description": mr.get("description"),
+            "state": mr.get("state"),
+            "author": mr.get("author") or {},
+            "source_branch": mr.get("sourceBranch"),
+            "target_branch": mr.get("targetBranch"),
+        }
+        diff_refs = mr.get("diffRefs")
+        if diff_refs:
+            mr_data["diff_refs"] = {
+                "base_sha": diff_refs.get("baseSha"),
+                "head_sha": diff_refs.get("headSha"),
+                "start_sha": diff_refs.get("startSha"),
+            }
+
+        if not mr["commits"]["pageInfo"]["hasNextPage"]:
+            commits = [
+                {
+                    "id": c.get("sha"),
+                    "short_id": c.get("shortId"),
+                    "title": c.get("title"),
+                    "author_name": c.get("authorName"),
+                }
+                for c in mr["commits"]["nodes"]
+            ]
+
+        # Notes are read inline from the discussions, never fetched per discussion.
+        # If any list is truncated, or a diff line note needs its line_range, the
+        # paginated REST discussions endpoint (which always embeds every note)
+        # replaces the whole set in one pass.
+        if not mr["discussions"]["pageInfo"]["hasNextPage"] and not any(
+            d["notes"]["pageInfo"]["hasNextPage"] or _has_text_position(d)
+            for d in mr["discussions"]["nodes"]
+        ):
+            discussions = []
+            for d in mr["discussions"]["nodes"]:
+                notes = [_graphql_note_to_rest(n) for n in d["notes"]["nodes"]]
+                discussions.append({
+                    "id": _gid_parts(d["id"])[1],
+                    # 独立评论的 discussion 只包含一条普通 note
+                    "individual_note": len(notes) == 1 and notes[0]["type"] is None,
+                    "notes": notes,
+                })
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning(f"GraphQL fetch failed, falling back to REST: {e!r}")
+        return await asyncio.gather(
+            _get(session, mr_path),
+            _get_all(session, f"{mr_path}/commits"),
+            _get_all(session, f"{mr_path}/discussions"),
+        )
+
+    if commits is None and discussions is None:
+        commits, discussions = await asyncio.gather(
+            _get_all(session, f"{mr_path}/commits"),
+            _get_all(session, f"{mr_path}/discussions"),
+        )
+    elif commits is None:
+        commits = await _get_all(session, f"{mr_path}/commits")
+    elif discussions is None:
+        discussions = await _get_all(session, f"{mr_path}/discussions")
+
+    return mr_data, commits, discussions
+
+@functools.cache
+def _exclude_re() -> Optional[re.Pattern]:
+    """
+    Compile the configured exclude_patterns into a single regular expression.
+
+    Directory patterns (ending with '/') match paths that start with the
+    directory or contain it at any depth; other patterns are fnmatch globs.
+    The configuration is read once, so the regex is built on first use only.
+
+    Returns:
+        The compiled pattern, or None if there are no patterns
+    """
+    parts = []
+    for pattern in _config().get("exclude_patterns", []):
         if pattern.endswith('/'):
-            if file_path.startswith(pattern) or f"/{pattern}" in file_path:
-                return True
-        elif fnmatch.fnmatch(file_path, pattern):
-            return True
-    return False
+            parts.append(f"(?s:(?:.*/)?{re.escape(pattern)})")
+        else:
+            parts.append(fnmatch.translate(pattern))
+    return re.compile("|".join(parts)) if parts else None
+
+# Fields kept when slimming GitLab objects for fetch_merge_request. "author" is
+# listed to keep its place in the output and is then replaced by the author's name;
+# a note without "position" gets an empty one.
+_MR_KEEP = ("id", "iid", "project_id", "title", "description", "state", "author", "source_branch", "target_branch")
+_CHANGE_KEEP = ("new_path", "old_path", "new_file", "renamed_file", "deleted_file", "diff")
+_COMMIT_KEEP = ("id", "short_id", "title", "author_name")
+_NOTE_KEEP = ("id", "type", "body", "system", "author", "position")
+# Column names used for commits when columnar output is enabled
+_COMMIT_COLUMNS = (("id", "ids"), ("short_id", "short_ids"), ("title", "titles"), ("author_name", "authors"))
+
+def _to_columns(rows: List[Dict[str, Any]], columns: Tuple[Tuple[str, str], ...]) -> Dict[str, List[Any]]:
+    """
+    Turn a list of dicts into a dict of lists, so each key is written once.
+
+    Args:
+        rows: The records to transpose
+        columns: (record key, column name) pairs to keep
+    Returns:
+        Dict mapping each column name to the values of all rows, in row order
+    """
+    return {name: [row.get(key) for row in rows] for key, name in columns}
+
+async def _fetch_changes(
+    session: aiohttp.ClientSession, mr_path: str
+) -> List[Dict[str, Any]]:
+    """
+    Fetch the changes of a merge request, dropping files matched by the
+    configured exclude_patterns while parsing.
+
+    The response is parsed incrementally with ijson, so only one change entry
+    and the kept, slimmed entries are held in memory at any time rather than
+    the whole decoded payload.
+
+    Args:
+        session: The shared GitLab HTTP session
+        mr_path: The REST path of the merge request
+    Returns:
+        The slimmed changes of the files that are not excluded
+    """
+    path = f"{mr_path}/changes"
+    async with session.get(f"{API_PREFIX}{path}") as resp:
+        if resp.status >= 400:
+            body = await resp.read()
+            logger.error(
+                f"GitLab API error {resp.status} on GET {path}: "
+                f"{body.decode('utf-8', 'replace')}"
+            )
+            resp.raise_for_status()
+
+        # Bind the compiled regex's match once instead of looking it up per file
+        exclude_re = _exclude_re()
+        excluded = exclude_re.match if exclude_re is not None else lambda path: None
+        return [
+            {k: change.get(k) for k in _CHANGE_KEEP}
+            async for change in ijson.items_async(resp.content, "changes.item")
+            if not excluded(change.get("new_path"))
+        ]
 
 @mcp.tool()
-def fetch_code_review_rules(ctx: Context):
+async def fetch_code_review_rules(ctx: Context):
     """
     Fetch the team's code review rules from a remote server via SSH.
 
@@ -85,6 +596,12 @@ def fetch_code_review_rules(ctx: Context):
         str: The code review rules content on success, or a simple message if SSH is not configured
         Dict: Error information only on connection failures
     """
+    # paramiko is blocking, run it off the event loop so other tool calls proceed
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_POOL, _read_code_review_rules)
+
+def _read_code_review_rules():
+    """Read the code review rules over SSH, see fetch_code_review_rules."""
     # Read SSH configuration from environment variables
     ssh_host = os.getenv("CODE_REVIEW_SSH_HOST")
     ssh_port = int(os.getenv("CODE_REVIEW_SSH_PORT", "22"))
@@ -182,19 +699,29 @@ def dict_to_xml_string(data: Any, tag: str = "item", indent: int = 0) -> str:
     Returns:
         The XML string
     """
+    result: List[str] = []
+    _append_xml(result, data, tag, indent)
+    return "".join(result)
+
+def _append_xml(result: List[str], data: Any, tag: str, indent: int) -> None:
+    """
+    Append the XML fragments of data to result, see dict_to_xml_string.
+
+    All levels share one output list that is joined once at the end, so large
+    leaves such as diffs are copied once instead of once per nesting level.
+    """
     indent_str = "  " * indent
-    result = []
     
     if isinstance(data, dict):
         result.append(f"{indent_str}<{tag}>\n")
         for key, value in data.items():
             if value is not None:
-                result.append(dict_to_xml_string(value, str(key), indent + 1))
+                _append_xml(result, value, str(key), indent + 1)
         result.append(f"{indent_str}</{tag}>\n")
     elif isinstance(data, list):
         result.append(f"{indent_str}<{tag}>\n")
         for item in data:
-            result.append(dict_to_xml_string(item, "item", indent + 1))
+            _append_xml(result, item, "item", indent + 1)
         result.append(f"{indent_str}</{tag}>\n")
     else:
         # Leaf node with text content - no escaping
@@ -205,11 +732,9 @@ def dict_to_xml_string(data: Any, tag: str = "item", indent: int = 0) -> str:
         else:
             text = str(data)
         result.append(f"{indent_str}<{tag}>{text}</{tag}>\n")
-    
-    return "".join(result)
 
 @mcp.tool()
-def fetch_merge_request(ctx: Context, project_id: str, merge_request_iid: str):
+async def fetch_merge_request(ctx: Context, project_id: str, merge_request_iid: str):
     """
     Fetch a GitLab merge request and its contents.
     
@@ -222,84 +747,51 @@ def fetch_merge_request(ctx: Context, project_id: str, merge_request_iid: str):
     Returns:
         XML string containing the merge request information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
+    session = ctx.request_context.lifespan_context
+    mr_path = _mr_path(project_id, merge_request_iid)
+
+    # 请求互不依赖，并发发出；GraphQL 不提供 diff 内容，changes 始终走 REST
+    if _config().get("use_graphql", True):
+        (mr_data, all_commits, all_discussions), filtered_changes_list = await asyncio.gather(
+            _fetch_mr_graphql(session, project_id, merge_request_iid),
+            _fetch_changes(session, mr_path),
+        )
+    else:
+        mr_data, filtered_changes_list, all_commits, all_discussions = await asyncio.gather(
+            _get(session, mr_path),
+            _fetch_changes(session, mr_path),
+            _get_all(session, f"{mr_path}/commits"),
+            _get_all(session, f"{mr_path}/discussions"),
+        )
 
     # 精简 merge_request 信息
-    mr_data = mr.asdict()
-    slim_mr = {
-        "id": mr_data.get("id"),
-        "iid": mr_data.get("iid"),
-        "project_id": mr_data.get("project_id"),
-        "title": mr_data.get("title"),
-        "description": mr_data.get("description"),
-        "state": mr_data.get("state"),
-        "author": mr_data.get("author", {}).get("name"),
-        "source_branch": mr_data.get("source_branch"),
-        "target_branch": mr_data.get("target_branch"),
-    }
+    slim_mr = {k: mr_data.get(k) for k in _MR_KEEP}
+    slim_mr["author"] = (mr_data.get("author") or {}).get("name")
 
-    # 获取并过滤 changes
-    original_changes_data = mr.changes()
-    all_changes = original_changes_data.get("changes", [])
-
-    exclude_patterns = config.get("exclude_patterns", [])
-
-    filtered_changes_list = []
-    for change in all_changes:
-        file_path = change.get("new_path")
-        if not is_path_excluded(file_path, exclude_patterns):
-            slim_change = {
-                "new_path": change.get("new_path"),
-                "old_path": change.get("old_path"),
-                "new_file": change.get("new_file"),
-                "renamed_file": change.get("renamed_file"),
-                "deleted_file": change.get("deleted_file"),
-                "diff": change.get("diff")
-            }
-            filtered_changes_list.append(slim_change)
-    
-    # 创建一个只包含必要字段的精简版 changes 对象
+    # 创建一个只包含必要字段的精简版 changes 对象（changes 在解析时已完成过滤）
     slim_changes_obj = {
-        "diff_refs": original_changes_data.get("diff_refs"),
+        "diff_refs": mr_data.get("diff_refs"),
         "changes": filtered_changes_list
     }
 
     # 精简 commits
-    commits = [
-        {
-            "id": c.id,
-            "short_id": c.short_id,
-            "title": c.title,
-            "author_name": c.author_name,
-        }
-        for c in mr.commits(all=True)
-    ]
+    commits = [{k: c.get(k) for k in _COMMIT_KEEP} for c in all_commits]
 
     def slim_note(note):
-        if not isinstance(note, dict):
-            note = note.asdict()
-        author = note.get("author", {})
-        return {
-            "id": note.get("id"),
-            "type": note.get("type"),
-            "body": note.get("body"),
-            "system": note.get("system"),
-            "author": author.get("name"),
-            "position": note.get("position", {}),
-        }
+        slim = {k: note.get(k) for k in _NOTE_KEEP}
+        slim["author"] = (note.get("author") or {}).get("name")
+        if "position" not in note:
+            slim["position"] = {}
+        return slim
 
     # 精简 discussions 和其下的 notes
-    all_discussions = mr.discussions.list(all=True)
-
     discussions = []
     for d in all_discussions:
-        # d.attributes['notes'] 包含了该 discussion 下的所有 note 信息
-        slim_notes_list = [slim_note(n) for n in d.attributes.get('notes', [])]
+        # d['notes'] 内嵌了该 discussion 下的所有 note，无需再按 discussion 单独请求
+        slim_notes_list = [slim_note(n) for n in d.get('notes', [])]
         discussions.append({
-            "id": d.id,
-            "individual_note": d.individual_note,
+            "id": d.get("id"),
+            "individual_note": d.get("individual_note"),
             "notes": slim_notes_list
         })
 
@@ -307,20 +799,20 @@ def fetch_merge_request(ctx: Context, project_id: str, merge_request_iid: str):
     result_data = {
         "merge_request": slim_mr,
         "changes": slim_changes_obj,
-        "commits": commits,
-        "discussions": discussions,
     }
+    # 列式输出：每个字段名只出现一次，减少提交较多时的输出体积。
+    # notes 按 discussion 分组，每组通常只有一两条，列式反而更大，因此保持逐行输出
+    if _config().get("columnar_commits", False):
+        result_data["commits_columnar"] = _to_columns(commits, _COMMIT_COLUMNS)
+    else:
+        result_data["commits"] = commits
+    result_data["discussions"] = discussions
     
     # 转换为XML并返回
-    xml_parts = ['<?xml version="1.0" encoding="utf-8"?>\n<merge_request_data>\n']
-    for key, value in result_data.items():
-        xml_parts.append(dict_to_xml_string(value, key, 1))
-    xml_parts.append('</merge_request_data>\n')
-    
-    return "".join(xml_parts)
+    return '<?xml version="1.0" encoding="utf-8"?>\n' + dict_to_xml_string(result_data, "merge_request_data")
 
 @mcp.tool()
-def compare_versions(ctx: Context, project_id: str, from_sha: str, to_sha: str) -> Dict[str, Any]:
+async def compare_versions(ctx: Context, project_id: str, from_sha: str, to_sha: str) -> Dict[str, Any]:
     """
     Compare two commits/branches/tags to see the differences between them.
     
@@ -331,19 +823,36 @@ def compare_versions(ctx: Context, project_id: str, from_sha: str, to_sha: str)
     Returns:
         Dict containing the comparison information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
+    session = ctx.request_context.lifespan_context
+    project_path = _project_path(project_id)
+    cache_key = (project_path, from_sha, to_sha)
+    cached = _compare_cache.get(cache_key)
+    if cached is not None:
+        return cached[0]
+    # Branches and tags move, only SHA-to-SHA comparisons are cacheable
+    cacheable = bool(_SHA_RE.fullmatch(from_sha) and _SHA_RE.fullmatch(to_sha))
     
     try:
-        result = project.repository_compare(from_sha, to_sha)
+        # A cacheable result is kept here, so it skips the ETag cache
+        result = await _get(
+            session,
+            f"{project_path}/repository/compare",
+            params={"from": from_sha, "to": to_sha},
+            etag=not cacheable,
+        )
     except Exception as e:
         logger.error(f"Failed to compare {from_sha} and {to_sha}: {e}")
-        result = {}
+        return {}
+    
+    if cacheable:
+        size = len(orjson.dumps(result))
+        if size <= COMPARE_CACHE_BYTES:
+            _compare_cache[cache_key] = (result, size)
     
     return result
 
 @mcp.tool()
-def add_merge_request_comment(ctx: Context, project_id: str, merge_request_iid: str, body: str) -> Dict[str, Any]:
+async def add_merge_request_comment(ctx: Context, project_id: str, merge_request_iid: str, body: str) -> Dict[str, Any]:
     """
     Add a general comment to a merge request.
     
@@ -354,16 +863,16 @@ def add_merge_request_comment(ctx: Context, project_id: str, merge_request_iid:
     Returns:
         Dict containing the created comment information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
+    session = ctx.request_context.lifespan_context
     
-    note = mr.notes.create({'body': body})
+    note = await _post(
+        session, f"{_mr_path(project_id, merge_request_iid)}/notes", {'body': body}
+    )
     
-    return note.asdict()
+    return note
 
 @mcp.tool()
-def add_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, body: str, position: Dict[str, Any]) -> Dict[str, Any]:
+async def add_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, body: str, position: Dict[str, Any]) -> Dict[str, Any]:
     """
     Add a discussion to a merge request at a specific position in a file.
     
@@ -386,25 +895,26 @@ def add_merge_request_discussion(ctx: Context, project_id: str, merge_request_ii
     Returns:
         Dict containing the created discussion information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
+    session = ctx.request_context.lifespan_context
     
     discussion_data = {'body': body, 'position': position}
     logger.info(f"Creating discussion with data: {discussion_data}")
     
     try:
-        discussion = mr.discussions.create(discussion_data)
-        logger.info(f"Successfully created discussion: {discussion.id}")
-        return discussion.asdict()
-    except gitlab.exceptions.GitlabHttpError as e:
-        logger.error(f"GitLab API error while creating discussion: {e.error_message}", exc_info=True)
-        logger.error(f"Response body: {e.response_body}")
+        discussion = await _post(
+            session,
+            f"{_mr_path(project_id, merge_request_iid)}/discussions",
+            discussion_data,
+        )
+        logger.info(f"Successfully created discussion: {discussion.get('id')}")
+        return discussion
+    except aiohttp.ClientResponseError as e:
+        logger.error(f"GitLab API error while creating discussion: {e.status} {e.message}", exc_info=True)
         raise e
 
 
 @mcp.tool()
-def reply_to_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str, body: str) -> Dict[str, Any]:
+async def reply_to_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str, body: str) -> Dict[str, Any]:
     """
     Reply to a merge request discussion.
     
@@ -416,18 +926,16 @@ def reply_to_merge_request_discussion(ctx: Context, project_id: str, merge_reque
     Returns:
         Dict containing the created note information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
-    discussion = mr.discussions.get(discussion_id)
+    session = ctx.request_context.lifespan_context
+    discussion_path = f"{_mr_path(project_id, merge_request_iid)}/discussions/{discussion_id}"
     
-    note = discussion.notes.create({'body': body})
+    note = await _post(session, f"{discussion_path}/notes", {'body': body})
     
-    return note.asdict()
+    return note
 
 
 @mcp.tool()
-def resolve_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str, resolved: bool = True) -> Dict[str, Any]:
+async def resolve_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str, resolved: bool = True) -> Dict[str, Any]:
     """
     Resolve or unresolve a merge request discussion.
     
@@ -439,19 +947,16 @@ def resolve_merge_request_discussion(ctx: Context, project_id: str, merge_reques
     Returns:
         Dict containing the updated discussion information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
-    discussion = mr.discussions.get(discussion_id)
+    session = ctx.request_context.lifespan_context
+    discussion_path = f"{_mr_path(project_id, merge_request_iid)}/discussions/{discussion_id}"
     
-    discussion.resolved = resolved
-    discussion.save()
+    discussion = await _put(session, discussion_path, {'resolved': resolved})
     
-    return discussion.asdict()
+    return discussion
 
 
 @mcp.tool()
-def delete_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str) -> Dict[str, Any]:
+async def delete_merge_request_discussion(ctx: Context, project_id: str, merge_request_iid: str, discussion_id: str, note_id: Optional[str] = None) -> Dict[str, Any]:
     """
     Delete a merge request discussion.
     
@@ -459,25 +964,28 @@ def delete_merge_request_discussion(ctx: Context, project_id: str, merge_request
         project_id: The GitLab project ID or URL-encoded path
         merge_request_iid: The merge request IID (project-specific ID)
         discussion_id: The ID of the discussion to delete
+        note_id: Optional ID of the discussion's first note; when given, the
+            discussion is not fetched before deleting
     Returns:
         Dict containing the status of the deletion
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
-    discussion = mr.discussions.get(discussion_id)
+    session = ctx.request_context.lifespan_context
+    discussion_path = f"{_mr_path(project_id, merge_request_iid)}/discussions/{discussion_id}"
     
     # To delete a discussion, we delete its first note.
     # If the discussion only has one note, the discussion will be deleted.
-    if discussion.notes:
-        first_note_id = discussion.notes[0]['id']
-        discussion.notes.delete(first_note_id)
-        return {"status": "success", "deleted_note_id": first_note_id}
+    if note_id is None:
+        discussion = await _get(session, discussion_path)
+        notes = discussion.get('notes', [])
+        if not notes:
+            return {"status": "failed", "message": "Discussion has no notes to delete."}
+        note_id = notes[0]['id']
     
-    return {"status": "failed", "message": "Discussion has no notes to delete."}
+    await _delete(session, f"{discussion_path}/notes/{note_id}")
+    return {"status": "success", "deleted_note_id": note_id}
 
 @mcp.tool()
-def approve_merge_request(ctx: Context, project_id: str, merge_request_iid: str, approvals_required: Optional[int] = None) -> Dict[str, Any]:
+async def approve_merge_request(ctx: Context, project_id: str, merge_request_iid: str, approvals_required: Optional[int] = None) -> Dict[str, Any]:
     """
     Approve a merge request.
     
@@ -488,19 +996,18 @@ def approve_merge_request(ctx: Context, project_id: str, merge_request_iid: str,
     Returns:
         Dict containing the approval information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
+    session = ctx.request_context.lifespan_context
+    mr_path = _mr_path(project_id, merge_request_iid)
     
-    mr.approve()
+    approval = await _post(session, f"{mr_path}/approve") or {}
     
     if approvals_required is not None:
-        mr.approvals.post({'approvals_required': approvals_required})
+        await _post(session, f"{mr_path}/approvals", {'approvals_required': approvals_required})
         
-    return mr.asdict()
+    return approval
 
 @mcp.tool()
-def unapprove_merge_request(ctx: Context, project_id: str, merge_request_iid: str) -> Dict[str, Any]:
+async def unapprove_merge_request(ctx: Context, project_id: str, merge_request_iid: str) -> Dict[str, Any]:
     """
     Unapprove a merge request.
     
@@ -510,19 +1017,19 @@ def unapprove_merge_request(ctx: Context, project_id: str, merge_request_iid: st
     Returns:
         Dict containing the unapproval information
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
-    mr = project.mergerequests.get(merge_request_iid)
+    session = ctx.request_context.lifespan_context
+    mr_path = _mr_path(project_id, merge_request_iid)
     
     try:
-        mr.unapprove()
+        approval = await _post(session, f"{mr_path}/unapprove") or {}
     except Exception as e:
         logger.error(f"Failed to unapprove merge request {merge_request_iid}: {e}")
+        approval = {}
     
-    return mr.asdict()
+    return approval
 
 @mcp.tool()
-def get_project_merge_requests(ctx: Context, project_id: str, state: str = "all", limit: int = 20) -> List[Dict[str, Any]]:
+async def get_project_merge_requests(ctx: Context, project_id: str, state: str = "all", limit: int = 20) -> List[Dict[str, Any]]:
     """
     Get all merge requests for a project.
     
@@ -533,15 +1040,21 @@ def get_project_merge_requests(ctx: Context, project_id: str, state: str = "all"
     Returns:
         List of merge request objects
     """
-    gl = ctx.request_context.lifespan_context
-    project = gl.projects.get(project_id)
+    if limit <= 0:
+        return []
+    session = ctx.request_context.lifespan_context
     
-    mrs = project.mergerequests.list(state=state, per_page=limit)
+    mrs = await _get_all(
+        session,
+        f"{_project_path(project_id)}/merge_requests",
+        params={"state": state, "per_page": min(limit, 100)},
+        max_items=limit,
+    )
     
-    return [mr.asdict() for mr in mrs]
+    return mrs
 
 @mcp.tool()
-def search_projects(ctx: Context, project_name: str = None) -> List[Dict[str, Any]]:
+async def search_projects(ctx: Context, project_name: str = None) -> List[Dict[str, Any]]:
     """
     Search for GitLab projects by name.
 
@@ -550,13 +1063,25 @@ def search_projects(ctx: Context, project_name: str = None) -> List[Dict[str, An
     Returns:
         A list of projects matching the search criteria.
     """
-    gl = ctx.request_context.lifespan_context
+    session = ctx.request_context.lifespan_context
 
-    projects = gl.projects.list(search=project_name)
+    # Only the first page is returned: without a search term this would
+    # otherwise enumerate every project visible to the token
+    params = {"per_page": 100}
+    if project_name:
+        params["search"] = project_name
+    projects = await _get(session, "/projects", params=params)
 
-    return [p.asdict() for p in projects]
+    return projects
 
 if __name__ == "__main__":
+    # Run the event loop on libuv when available (uvloop does not support Windows)
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
+
     try:
         logger.info("Starting GitLab Review MCP server")
         # Initialize and run the server